@@ -1,13 +1,22 @@
 import pygame
 import random
+import heapq
 import time
-import json
+import orjson
 import os
 import threading
 import cv2
 import numpy as np
 import paho.mqtt.client as mqtt
 
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional: without it the physics kernel runs as plain NumPy/Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]): return args[0]
+        return lambda fn: fn
+
 # ==========================================
 # 1. CONFIGURATION
 # ==========================================
@@ -17,6 +26,8 @@ class Config:
     PORT = 1883
     TOPIC_VEHICLE = "v2x/hackathon/final/cars"
     TOPIC_EMERGENCY = "v2x/hackathon/final/emergency"
+    PUBLISH_INTERVAL = 0.1  # Max 10 state updates/sec per vehicle
+    PUBLISH_KEEPALIVE = 1.0 # Resend unchanged state so peers don't drop us as a ghost
 
     # Window
     SCREEN_WIDTH = 1200
@@ -29,6 +40,8 @@ class Config:
     SERVICE_LANE_INDEX = 3
     ROAD_Y = 50
     TOTAL_LENGTH = 2000 
+    X_SCALE = SCREEN_WIDTH / TOTAL_LENGTH # World x -> screen x
+    CAR_Y = ROAD_Y + 35                   # Screen y of a car body in lane 0
 
     # Physics
     MAX_SPEED_KMH = 250
@@ -36,6 +49,8 @@ class Config:
     ACCEL = 10   
     BRAKE = 25   
     LANE_CHANGE_SPEED = 2.0 
+    PHYSICS_HZ = 30      # Fixed simulation step, independent of the render rate
+    MAX_FRAME_DT = 0.1   # Clamp frame time after a hitch (avoids spiral of death)
     
     # Safety
     SAFE_DIST = 200  
@@ -44,6 +59,16 @@ class Config:
     GHOST_TIMEOUT = 3.0 
     DROWSY_TIME_THRESHOLD = 2.0
 
+    # Face Detection
+    DETECT_WIDTH = 320   # Haar runs on a frame downscaled to this width
+    DETECT_MIN_FACE = 30 # Smallest face (px, detection scale) worth searching for
+    DETECT_HZ = 6        # Detector cadence; camera frames still reach the HUD at full rate
+    DETECT_REUSE_MAX = 1.0 # Max age (s) of a detection reused for an unchanged frame
+    CAM_W = 240          # Driver cam HUD size
+    CAM_H = 180
+    CAPTURE_WIDTH = 320  # Resolution requested from the webcam
+    CAPTURE_HEIGHT = 240
+
     # Colors (Professional Palette)
     C_BG = (235, 240, 245)      # Soft Blue-Grey
     C_ROAD = (60, 60, 70)       # Dark Asphalt
@@ -60,26 +85,108 @@ class Config:
 class UniversalDetector:
     def __init__(self):
         self.cap = cv2.VideoCapture(0)
+        # Small capture: less USB bandwidth, cheaper cvtColor/resize/detect
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAPTURE_WIDTH)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAPTURE_HEIGHT)
         self.drowsy = False
         self.no_face_start_time = None
         self.running = True
         self.current_frame = None 
         self.lock = threading.Lock()
+
+        # Grabber -> Detector hand-off (single latest-frame slot)
+        self._latest_bgr = None
+        self._frame_ready = threading.Event()
+        self.faces = [] # Last detected faces, full-resolution (x, y, w, h)
+        self._last_hash = None # Average hash of the last frame Haar actually ran on
+        self._last_faces = ()
+        self._last_detect_t = 0.0
+        self._rgb_buf = np.empty((Config.CAM_W, Config.CAM_H, 3), np.uint8) # HUD image, (x, y) order
+        self._bufs = {}         # Scratch buffers for the grab/detect loops (see _scratch)
+        self._surf = None       # Cached HUD Surface, rebuilt only when a new frame lands
+        self._surf_dirty = False
         
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         
-        self.thread = threading.Thread(target=self.loop, daemon=True)
-        self.thread.start()
+        self.grab_thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self.detect_thread = threading.Thread(target=self._detect_loop, daemon=True)
+        self.grab_thread.start()
+        self.detect_thread.start()
         print("✅ Camera Active")
 
-    def loop(self):
+    def _grab_loop(self):
+        # Runs at camera rate: read, publish latest frame, refresh the HUD image
         while self.running and self.cap.isOpened():
             success, frame = self.cap.read()
             if not success: continue
 
-            # Detection Logic (Grayscale)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+            with self.lock:
+                self._latest_bgr = frame
+                faces = self.faces
+            self._frame_ready.set()
+
+            # 1. Downscale to HUD size (own buffer, the detector keeps the BGR frame)
+            disp = cv2.resize(frame, (Config.CAM_W, Config.CAM_H), dst=self._scratch('disp', (Config.CAM_H, Config.CAM_W, 3)),
+                              interpolation=cv2.INTER_AREA)
+            sx = Config.CAM_W / frame.shape[1]
+            sy = Config.CAM_H / frame.shape[0]
+            # Draw Face Box from the latest detection
+            for (x, y, w, h) in faces:
+                cv2.rectangle(disp, (int(x*sx), int(y*sy)), (int((x+w)*sx), int((y+h)*sy)), (0, 255, 0), 2)
+            # 2. Transpose to Pygame's (x, y) axis order (replaces rot90 + flip)
+            disp = cv2.transpose(disp, dst=self._scratch('disp_t', (Config.CAM_W, Config.CAM_H, 3)))
+
+            with self.lock:
+                # 3. Convert BGR to RGB into the persistent, contiguous buffer
+                cv2.cvtColor(disp, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+                self.current_frame = self._rgb_buf
+                self._surf_dirty = True
+
+    def _scratch(self, name, shape):
+        # Persistent uint8 buffer for OpenCV dst=; reallocated only if the frame size changes.
+        # Each name is used by one thread only.
+        buf = self._bufs.get(name)
+        if buf is None or buf.shape != shape:
+            buf = self._bufs[name] = np.empty(shape, np.uint8)
+        return buf
+
+    def _detect_loop(self):
+        # Runs at Config.DETECT_HZ on the newest frame; only one detect in flight
+        period = 1.0 / Config.DETECT_HZ
+        while self.running:
+            if not self._frame_ready.wait(timeout=0.5): continue
+            self._frame_ready.clear()
+            started = time.time()
+
+            with self.lock:
+                frame = self._latest_bgr
+
+            # Detection Logic (Grayscale, downscaled)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._scratch('gray', frame.shape[:2]))
+            scale = Config.DETECT_WIDTH / gray.shape[1]
+            if scale < 1.0:
+                small_h = round(gray.shape[0] * scale)
+                small = cv2.resize(gray, (Config.DETECT_WIDTH, small_h), dst=self._scratch('small', (small_h, Config.DETECT_WIDTH)),
+                                   interpolation=cv2.INTER_AREA)
+            else:
+                # Camera honoured the small capture size: detect on it directly
+                scale = 1.0
+                small = gray
+
+            # 8x8 average hash: a still scene reuses the last result for a while
+            tiny = cv2.resize(small, (8, 8), dst=self._scratch('tiny', (8, 8)), interpolation=cv2.INTER_AREA)
+            frame_hash = (tiny > tiny.mean()).tobytes()
+            if frame_hash == self._last_hash and started - self._last_detect_t < Config.DETECT_REUSE_MAX:
+                faces = self._last_faces
+            else:
+                max_face = min(small.shape[:2])
+                faces = self.face_cascade.detectMultiScale(
+                    small, 1.2, 4,
+                    minSize=(Config.DETECT_MIN_FACE, Config.DETECT_MIN_FACE),
+                    maxSize=(max_face, max_face))
+                self._last_hash = frame_hash
+                self._last_faces = faces
+                self._last_detect_t = started
 
             if len(faces) == 0:
                 if self.no_face_start_time is None:
@@ -89,26 +196,23 @@ class UniversalDetector:
             else:
                 self.no_face_start_time = None
                 self.drowsy = False
-            
-            # Draw Face Box
-            for (x, y, w, h) in faces:
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
 
+            # Scale boxes back to full resolution for the grabber to draw
             with self.lock:
-                # 1. Convert BGR to RGB
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                # 2. Rotate 90 degrees (Correcting for Pygame axis)
-                self.current_frame = np.rot90(rgb_frame)
+                self.faces = [(int(x / scale), int(y / scale), int(w / scale), int(h / scale))
+                              for (x, y, w, h) in faces]
 
-            time.sleep(0.05)
+            time.sleep(max(0.0, period - (time.time() - started)))
 
     def get_frame(self):
         with self.lock:
-            if self.current_frame is not None:
-                surf = pygame.surfarray.make_surface(self.current_frame)
-                # 3. Flip Horizontal (Mirror Effect)
-                return pygame.transform.flip(surf, True, False)
-        return None
+            if self._surf_dirty:
+                if self._surf is None:
+                    self._surf = pygame.Surface((Config.CAM_W, Config.CAM_H))
+                # Copy in place; buffer is already in (x, y) order
+                pygame.surfarray.blit_array(self._surf, self.current_frame)
+                self._surf_dirty = False
+            return self._surf
 
     def stop(self):
         self.running = False
@@ -124,19 +228,87 @@ class Button:
         self.color = color
         self.cb = cb
         self.hover = False
+        self._txt = None # Label rendered once on first draw
 
     def draw(self, screen, font):
         # Subtle hover effect
         col = (min(self.color[0]+20,255), min(self.color[1]+20,255), min(self.color[2]+20,255)) if self.hover else self.color
         pygame.draw.rect(screen, col, self.rect, border_radius=6)
         pygame.draw.rect(screen, (150,150,150), self.rect, 1, border_radius=6)
-        txt = font.render(self.text, True, (255,255,255))
+        if self._txt is None: self._txt = font.render(self.text, True, (255,255,255))
+        txt = self._txt
         screen.blit(txt, (self.rect.centerx - txt.get_width()//2, self.rect.centery - txt.get_height()//2))
 
     def check_click(self, pos):
         if self.rect.collidepoint(pos) and self.cb:
             self.cb()
 
+# Numba freezes module globals as constants but cannot read class attributes
+_TOTAL_LENGTH = float(Config.TOTAL_LENGTH)
+_FAR = 2.0 * _TOTAL_LENGTH # "No car ahead" sentinel; finite so fastmath stays valid
+_LANE_COUNT = Config.LANE_COUNT
+_SERVICE_LANE_INDEX = Config.SERVICE_LANE_INDEX
+_MAX_SPEED_MS = Config.MAX_SPEED_MS
+_ACCEL = float(Config.ACCEL)
+_BRAKE = float(Config.BRAKE)
+_SAFE_DIST = float(Config.SAFE_DIST)
+_CRITICAL_DIST = float(Config.CRITICAL_DIST)
+_AMBULANCE_DIST = float(Config.AMBULANCE_DIST)
+
+@njit(cache=True, fastmath=True)
+def _physics_kernel(xs, lanes, speeds, emg, my_idx, is_drowsy, is_emergency,
+                    lane, x, speed, target_speed, user_target_speed, cooldown, dt):
+    # Closest car ahead / ambulance behind in the same lane
+    d_ahead = (xs - x) % _TOTAL_LENGTH
+    d_behind = (x - xs) % _TOTAL_LENGTH
+    same_lane = lanes == lane
+    same_lane[my_idx] = False
+    d_ahead = np.where(same_lane, d_ahead, _FAR)
+    i = np.argmin(d_ahead)
+    dist_to_ahead = d_ahead[i]
+    speed_of_car_ahead = speeds[i]
+    ambulance_behind = (same_lane & emg & (d_behind < _AMBULANCE_DIST)).any()
+
+    warning = False
+    braking = False
+    cooldown -= dt
+
+    # === LOGIC ===
+    if is_drowsy:
+        if lane != _SERVICE_LANE_INDEX:
+            if cooldown <= 0:
+                lane += 1
+                cooldown = 1.0
+        else:
+            target_speed = 0.0
+            braking = True
+
+    elif ambulance_behind and not is_emergency and cooldown <= 0:
+        if lane < _LANE_COUNT - 1: lane += 1; cooldown = 2.0
+        elif lane > 0: lane -= 1; cooldown = 2.0
+
+    elif is_emergency:
+        target_speed = _MAX_SPEED_MS * 1.2
+    elif dist_to_ahead < _CRITICAL_DIST:
+        target_speed = 0.0
+        warning = True
+        braking = True
+    elif dist_to_ahead < _SAFE_DIST:
+        target_speed = speed_of_car_ahead * 0.8
+        braking = True
+        if speed > speed_of_car_ahead: warning = True
+    else:
+        target_speed = user_target_speed
+
+    # Physics
+    if speed < target_speed: speed += _ACCEL * dt
+    elif speed > target_speed: speed -= _BRAKE * dt
+
+    speed = max(0.0, min(speed, _MAX_SPEED_MS * 1.5))
+    x += speed * dt
+    if x > _TOTAL_LENGTH: x = 0.0
+    return lane, x, speed, float(target_speed), braking, warning, cooldown
+
 class Vehicle:
     def __init__(self, uid, is_emergency=False):
         self.id = uid
@@ -144,6 +316,7 @@ class Vehicle:
         self.lane = 1 if not is_emergency else 0
         self.visual_lane = float(self.lane)
         self.x = 0 if is_emergency else random.randint(0, 1500)
+        self.prev_x = self.x # Position before the last physics step (render interpolation)
         self.speed = Config.MAX_SPEED_MS if is_emergency else random.randint(20, 30)
         self.user_target_speed = 25 
         self.target_speed = self.speed
@@ -153,68 +326,39 @@ class Vehicle:
         self.drowsy_alert = False
         self.last_update = time.time()
         self.lane_change_cooldown = 0
-
-    def update_physics(self, dt, all_vehicles, is_me_drowsy=False):
-        dist_to_ahead = float('inf')
-        speed_of_car_ahead = None
-        ambulance_behind = False
-        
-        for other in all_vehicles.values():
-            if other.id == self.id: continue
-            d_ahead = other.x - self.x
-            d_behind = self.x - other.x
-            if d_ahead < 0: d_ahead += Config.TOTAL_LENGTH
-            if d_behind < 0: d_behind += Config.TOTAL_LENGTH
-
-            if other.lane == self.lane:
-                if d_ahead < dist_to_ahead:
-                    dist_to_ahead = d_ahead
-                    speed_of_car_ahead = other.speed
-                if other.is_emergency and d_behind < Config.AMBULANCE_DIST:
-                    ambulance_behind = True
-
-        self.warning_vehicle_ahead = False
-        self.braking = False
-        self.lane_change_cooldown -= dt
-
-        # === LOGIC ===
-        if is_me_drowsy:
-            self.drowsy_alert = True
-            if self.lane != Config.SERVICE_LANE_INDEX:
-                if self.lane_change_cooldown <= 0:
-                    self.lane += 1
-                    self.lane_change_cooldown = 1.0
-            else:
-                self.target_speed = 0
-                self.braking = True
-        
-        elif ambulance_behind and not self.is_emergency and self.lane_change_cooldown <= 0:
-            if self.lane < Config.LANE_COUNT - 1: self.lane += 1; self.lane_change_cooldown = 2.0
-            elif self.lane > 0: self.lane -= 1; self.lane_change_cooldown = 2.0
-
-        elif self.is_emergency:
-            self.target_speed = Config.MAX_SPEED_MS * 1.2
-        elif dist_to_ahead < Config.CRITICAL_DIST:
-            self.target_speed = 0
-            self.warning_vehicle_ahead = True
-            self.braking = True
-        elif dist_to_ahead < Config.SAFE_DIST:
-            if speed_of_car_ahead is not None:
-                self.target_speed = speed_of_car_ahead * 0.8 
-            else:
-                self.target_speed = 10 
-            self.braking = True 
-            if self.speed > (speed_of_car_ahead or 0): self.warning_vehicle_ahead = True
-        else:
-            self.target_speed = self.user_target_speed
-        
-        # Physics
-        if self.speed < self.target_speed: self.speed += Config.ACCEL * dt
-        elif self.speed > self.target_speed: self.speed -= Config.BRAKE * dt
-
-        self.speed = max(0, min(self.speed, Config.MAX_SPEED_MS * 1.5))
-        self.x += self.speed * dt
-        if self.x > Config.TOTAL_LENGTH: self.x = 0
+        self.label = None # (color, Surface) ID tag, see V2XApp.id_label
+        self.body = None  # (color_int, Surface) fallback car body, see V2XApp.car_body
+
+    @property
+    def color(self):
+        # Stored packed as 0xRRGGBB (one int on the wire); unpacked for drawing
+        c = self.color_int
+        return ((c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF)
+
+    @color.setter
+    def color(self, rgb):
+        r, g, b = rgb
+        self.color_int = (r << 16) | (g << 8) | b
+
+    def update_physics(self, dt, xs, lanes, speeds, emg, my_idx, is_me_drowsy=False):
+        # Neighbor search runs over the per-tick Struct-of-Arrays snapshot (see V2XApp.refresh_soa)
+        if is_me_drowsy: self.drowsy_alert = True
+        (self.lane, self.x, self.speed, self.target_speed, self.braking,
+         self.warning_vehicle_ahead, self.lane_change_cooldown) = _physics_kernel(
+            xs, lanes, speeds, emg, my_idx, bool(is_me_drowsy), bool(self.is_emergency),
+            int(self.lane), float(self.x), float(self.speed), float(self.target_speed),
+            float(self.user_target_speed), float(self.lane_change_cooldown), float(dt))
+
+    def render_x(self, alpha):
+        # Blend the last two physics steps; never blend across the wrap back to 0
+        if self.x < self.prev_x: return self.x
+        return self.prev_x + (self.x - self.prev_x) * alpha
+
+    def extrapolate_x(self, now):
+        # Remote cars update at publish rate (~10Hz): dead-reckon from the last message,
+        # capped at the keepalive gap so a stalled peer doesn't drift off
+        dt = min(max(0.0, now - self.last_update), Config.PUBLISH_KEEPALIVE)
+        return (self.x + self.speed * dt) % Config.TOTAL_LENGTH
 
     def update_visuals(self, dt):
         diff = self.lane - self.visual_lane
@@ -227,24 +371,25 @@ class Vehicle:
             self.visual_lane = float(self.lane)
 
     def to_json(self):
-        return json.dumps({
+        return orjson.dumps({
             "id": self.id, "lane": self.lane, "x": self.x, 
             "spd": self.speed, "emb": self.is_emergency, 
-            "col": self.color, "drw": self.drowsy_alert, "brk": self.braking
+            "col": self.color_int, "drw": self.drowsy_alert, "brk": self.braking
         })
 
     @staticmethod
-    def from_json(payload):
-        try:
-            d = json.loads(payload)
-            v = Vehicle(d['id'], d['emb'])
-            v.lane = d['lane']; v.x = d['x']; v.speed = d['spd']; v.color = tuple(d['col'])
-            v.drowsy_alert = d.get('drw', False)
-            v.braking = d.get('brk', False)
-            v.visual_lane = float(v.lane)
-            v.last_update = time.time()
-            return v
-        except: return None
+    def from_dict(d):
+        # d is an already-parsed to_json() payload
+        v = Vehicle(d['id'], d['emb'])
+        v.lane = d['lane']; v.x = v.prev_x = d['x']; v.speed = d['spd']
+        col = d['col']
+        if isinstance(col, int): v.color_int = col
+        else: v.color = col # Older clients send [r, g, b]; anything else raises here
+        v.drowsy_alert = d.get('drw', False)
+        v.braking = d.get('brk', False)
+        v.visual_lane = float(v.lane)
+        v.last_update = time.time()
+        return v
 
 # ==========================================
 # 4. MAIN APPLICATION
@@ -252,7 +397,12 @@ class Vehicle:
 class V2XApp:
     def __init__(self, uid):
         pygame.init()
-        self.screen = pygame.display.set_mode((Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT))
+        # SCALED uses SDL's renderer (GPU texture path); vsync paces presents to the monitor
+        size = (Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT)
+        try:
+            self.screen = pygame.display.set_mode(size, pygame.SCALED | pygame.DOUBLEBUF, vsync=1)
+        except pygame.error:
+            self.screen = pygame.display.set_mode(size, pygame.SCALED | pygame.DOUBLEBUF)
         pygame.display.set_caption(f"V2X Professional - {uid}")
         self.clock = pygame.time.Clock()
         
@@ -265,10 +415,17 @@ class V2XApp:
         except:
             self.font = pygame.font.Font(None, 24)
             self.big_font = pygame.font.Font(None, 32)
+        self._text_cache = {} # (font id, text, color) -> rendered Surface; fixed UI strings only
+        self._bg = self.build_background()
+        self._flash_body = self.car_template((255, 50, 50)) # Ambulance flash, shared
+        self._brake_on = self.brake_stamp((255, 0, 0))
+        self._brake_off = self.brake_stamp((100, 0, 0))
 
         self.my_vehicle = Vehicle(uid)
         self.my_vehicle.color = (0, 200, 255) 
         self.vehicles = {uid: self.my_vehicle}
+        self._expiry_heap = [] # (last_update, vid) per received message, oldest first
+        self.vehicles_lock = threading.Lock() # on_message runs on the MQTT thread
         self.i_own_ambulance = False 
         self.images = self.load_assets()
         
@@ -291,6 +448,7 @@ class V2XApp:
 
         self.client = mqtt.Client(client_id=f"{uid}_{random.randint(1000,9999)}", callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
         self.client.on_message = self.on_message
+        self._last_pub = {} # vid -> (time, payload) of the last publish
         self.client.connect(Config.BROKER, Config.PORT)
         self.client.subscribe(Config.TOPIC_VEHICLE)
         self.client.loop_start()
@@ -315,34 +473,81 @@ class V2XApp:
         self.my_vehicle.user_target_speed = max(0, min(self.my_vehicle.user_target_speed, Config.MAX_SPEED_MS))
 
     def spawn_ambulance_click(self):
-        if "AMB-1" not in self.vehicles:
-            amb = Vehicle("AMB-1", is_emergency=True)
-            self.vehicles["AMB-1"] = amb
-            self.i_own_ambulance = True
+        with self.vehicles_lock:
+            if "AMB-1" not in self.vehicles:
+                amb = Vehicle("AMB-1", is_emergency=True)
+                self.vehicles["AMB-1"] = amb
+                self.i_own_ambulance = True
+
+    def refresh_soa(self):
+        # Struct-of-Arrays snapshot of all vehicles, rebuilt once per tick
+        vs = list(self.vehicles.values())
+        n = len(vs)
+        self._index = {v.id: i for i, v in enumerate(vs)}
+        self._xs = np.fromiter((v.x for v in vs), np.float64, n)
+        self._lanes = np.fromiter((v.lane for v in vs), np.int64, n)
+        self._speeds = np.fromiter((v.speed for v in vs), np.float64, n)
+        self._emg = np.fromiter((v.is_emergency for v in vs), np.bool_, n)
+
+    def step_vehicle(self, v, dt, is_drowsy=False):
+        i = self._index[v.id]
+        v.prev_x = v.x
+        v.update_physics(dt, self._xs, self._lanes, self._speeds, self._emg, i, is_me_drowsy=is_drowsy)
+        # Write back so later vehicles this tick see the new state
+        self._xs[i] = v.x; self._lanes[i] = v.lane; self._speeds[i] = v.speed
+
+    def step_physics(self, dt, is_drowsy):
+        # One fixed-size simulation step for the locally simulated vehicles
+        self.refresh_soa()
+        self.step_vehicle(self.my_vehicle, dt, is_drowsy=is_drowsy)
+        if self.i_own_ambulance and "AMB-1" in self.vehicles:
+            self.step_vehicle(self.vehicles["AMB-1"], dt)
 
     def on_message(self, client, userdata, msg):
+        # Runs on the MQTT network thread: parse once, then mutate under the lock
         try:
-            payload = msg.payload.decode()
-            d = json.loads(payload)
+            d = orjson.loads(msg.payload)
             if d['id'] != self.my_vehicle.id:
                 if d['id'] == "AMB-1" and self.i_own_ambulance: return
-                if d['id'] not in self.vehicles: 
-                    self.vehicles[d['id']] = Vehicle.from_json(payload)
-                else:
-                    v = self.vehicles[d['id']]
-                    v.x = d['x']; v.lane = d['lane']; v.speed = d['spd']; v.is_emergency = d['emb']
-                    v.drowsy_alert = d.get('drw', False)
-                    v.braking = d.get('brk', False)
-                    v.last_update = time.time()
+                with self.vehicles_lock:
+                    v = self.vehicles.get(d['id'])
+                    if v is None:
+                        v = self.vehicles[d['id']] = Vehicle.from_dict(d)
+                    else:
+                        v.x = v.prev_x = d['x']; v.lane = d['lane']; v.speed = d['spd']; v.is_emergency = d['emb']
+                        v.drowsy_alert = d.get('drw', False)
+                        v.braking = d.get('brk', False)
+                        v.last_update = time.time()
+                    heapq.heappush(self._expiry_heap, (v.last_update, v.id))
         except: pass
 
+    def publish_vehicle(self, v, now):
+        last_t, last_payload = self._last_pub.get(v.id, (0.0, None))
+        if now - last_t < Config.PUBLISH_INTERVAL: return
+        payload = v.to_json()
+        if payload == last_payload and now - last_t < Config.PUBLISH_KEEPALIVE: return
+        self.client.publish(Config.TOPIC_VEHICLE, payload, qos=0, retain=False)
+        self._last_pub[v.id] = (now, payload)
+
     def cleanup_ghosts(self):
+        # Only remote vehicles are in the heap; peek at the oldest update only
         now = time.time()
-        ghosts = [vid for vid, v in self.vehicles.items() 
-                  if vid != self.my_vehicle.id 
-                  and (now - v.last_update > Config.GHOST_TIMEOUT)]
-        if self.i_own_ambulance and "AMB-1" in ghosts: ghosts.remove("AMB-1")
-        for vid in ghosts: del self.vehicles[vid]
+        heap = self._expiry_heap
+        while heap and now - heap[0][0] > Config.GHOST_TIMEOUT:
+            t, vid = heapq.heappop(heap)
+            v = self.vehicles.get(vid)
+            # Skip entries superseded by a newer update
+            if v is None or v.last_update != t: continue
+            if self.i_own_ambulance and vid == "AMB-1": continue
+            del self.vehicles[vid]
+
+    def text(self, font, s, color):
+        # Rasterize each distinct (font, string, color) once and reuse the Surface
+        key = (id(font), s, color)
+        surf = self._text_cache.get(key)
+        if surf is None:
+            surf = self._text_cache[key] = font.render(s, True, color)
+        return surf
 
     def draw_dashed_line(self, surface, color, start_pos, end_pos, width=1, dash_len=20):
         x1, y1 = start_pos
@@ -350,41 +555,98 @@ class V2XApp:
         for x in range(x1, x2, dash_len * 2):
             pygame.draw.line(surface, color, (x, y1), (min(x + dash_len, x2), y1), width)
 
-    def draw_car(self, v):
-        x = (v.x / Config.TOTAL_LENGTH) * Config.SCREEN_WIDTH
-        y = Config.ROAD_Y + (v.visual_lane * Config.LANE_HEIGHT) + 35
+    def build_background(self):
+        # Road, lane markings and panel never change: draw them once
+        bg = pygame.Surface((Config.SCREEN_WIDTH, Config.SCREEN_HEIGHT))
+        bg.fill(Config.C_BG)
+        road_h = Config.LANE_HEIGHT * Config.LANE_COUNT
+        pygame.draw.rect(bg, Config.C_ROAD, (0, Config.ROAD_Y, Config.SCREEN_WIDTH, road_h))
         
-        drawn = False
+        for i in range(Config.LANE_COUNT+1):
+            y = Config.ROAD_Y + i*Config.LANE_HEIGHT
+            line_color = Config.C_LINE
+            if i == Config.SERVICE_LANE_INDEX:
+                line_color = Config.C_LINE_YELLOW 
+                pygame.draw.line(bg, line_color, (0,y), (Config.SCREEN_WIDTH,y), 4)
+            elif i == 0 or i == Config.LANE_COUNT:
+                pygame.draw.line(bg, line_color, (0,y), (Config.SCREEN_WIDTH,y), 3)
+            else:
+                self.draw_dashed_line(bg, line_color, (0, y), (Config.SCREEN_WIDTH, y), 3, 30)
+
+        svc_y = Config.ROAD_Y + (Config.SERVICE_LANE_INDEX * Config.LANE_HEIGHT) + 40
+        svc_txt = self.text(self.road_font, "SERVICE LANE", Config.C_SERVICE_TEXT)
+        for x in range(200, Config.SCREEN_WIDTH, 600):
+            bg.blit(svc_txt, (x, svc_y))
+
+        pygame.draw.rect(bg, Config.C_PANEL, (0, 640, Config.SCREEN_WIDTH, 160))
+        return bg.convert()
+
+    def car_template(self, col):
+        # Fallback car body in the given color
+        surf = pygame.Surface((110, 55), pygame.SRCALPHA)
+        pygame.draw.rect(surf, col, (0, 0, 110, 55), border_radius=10)
+        pygame.draw.rect(surf, (0,0,0), (0, 0, 110, 55), 2, border_radius=10)
+        pygame.draw.rect(surf, (20,20,40), (70, 5, 30, 45), border_radius=6)
+        return surf.convert_alpha()
+
+    def car_body(self, v):
+        # Cached on the Vehicle like id_label: colors come from the network,
+        # so the Surface must be freed when cleanup_ghosts drops the vehicle.
+        # Keyed by the packed int; the RGB tuple is only built for a new template.
+        if v.body is None or v.body[0] != v.color_int:
+            v.body = (v.color_int, self.car_template(v.color))
+        return v.body[1]
+
+    def id_label(self, v, color):
+        # Cached on the Vehicle rather than in _text_cache: IDs come from the network,
+        # so the Surface must be freed when cleanup_ghosts drops the vehicle
+        if v.label is None or v.label[0] != color:
+            v.label = (color, self.font.render(v.id, True, color))
+        return v.label[1]
+
+    def brake_stamp(self, col):
+        # Both brake lights baked into one Surface; blit at (x-2, y+5) to centre them on (x+5, y+12) / (x+5, y+43)
+        surf = pygame.Surface((14, 46), pygame.SRCALPHA)
+        pygame.draw.circle(surf, col, (7, 7), 6)
+        pygame.draw.circle(surf, col, (7, 38), 6)
+        return surf.convert_alpha()
+
+    def car_sprite(self, v):
+        # Returns (body Surface, drawn from an image asset)
         if self.images:
-            if v.is_emergency and 'amb' in self.images:
-                self.screen.blit(self.images['amb'], (x, y)); drawn = True
-            elif v.id == self.my_vehicle.id and 'me' in self.images:
-                self.screen.blit(self.images['me'], (x, y)); drawn = True
-            elif 'other' in self.images:
-                self.screen.blit(self.images['other'], (x, y)); drawn = True
-
-        if not drawn:
-            col = v.color
-            if v.is_emergency and (pygame.time.get_ticks() % 200 < 100): col = (255, 50, 50)
-            pygame.draw.rect(self.screen, col, (x, y, 110, 55), border_radius=10)
-            pygame.draw.rect(self.screen, (0,0,0), (x, y, 110, 55), 2, border_radius=10)
-            pygame.draw.rect(self.screen, (20,20,40), (x+70, y+5, 30, 45), border_radius=6)
-        
-        brake_col = (255, 0, 0) if v.braking else (100, 0, 0)
-        pygame.draw.circle(self.screen, brake_col, (x+5, y+12), 6)
-        pygame.draw.circle(self.screen, brake_col, (x+5, y+43), 6)
-        txt = self.font.render(v.id, True, (255,255,255) if not drawn else (0,0,0))
-        self.screen.blit(txt, (x, y-25))
-        
-        if v.drowsy_alert:
-             zzz = self.big_font.render("ZZZ", True, (255, 0, 255))
-             self.screen.blit(zzz, (x + 30, y - 50))
+            if v.is_emergency and 'amb' in self.images: return self.images['amb'], True
+            elif v.id == self.my_vehicle.id and 'me' in self.images: return self.images['me'], True
+            elif 'other' in self.images: return self.images['other'], True
+
+        if v.is_emergency and (pygame.time.get_ticks() % 200 < 100): return self._flash_body, False
+        return self.car_body(v), False
+
+    def draw_cars(self, vehicles, alpha, now):
+        bodies = []
+        overlays = [] # Brake lights, ID labels and drowsy markers, drawn over every body
+        for v in vehicles:
+            # Locally stepped cars blend physics steps; remote ones are extrapolated
+            local = v is self.my_vehicle or (self.i_own_ambulance and v.id == "AMB-1")
+            x = (v.render_x(alpha) if local else v.extrapolate_x(now)) * Config.X_SCALE
+            y = Config.CAR_Y + v.visual_lane * Config.LANE_HEIGHT
+            surf, drawn = self.car_sprite(v)
+            bodies.append((surf, (x, y)))
+            overlays.append((self._brake_on if v.braking else self._brake_off, (x-2, y+5)))
+            overlays.append((self.id_label(v, (255,255,255) if not drawn else (0,0,0)), (x, y-25)))
+            if v.drowsy_alert:
+                overlays.append((self.text(self.big_font, "ZZZ", (255, 0, 255)), (x + 30, y - 50)))
+
+        # One Python->C call per pass
+        self.screen.blits(bodies, doreturn=False)
+        self.screen.blits(overlays, doreturn=False)
 
     def run(self):
         running = True
+        step = 1.0 / Config.PHYSICS_HZ
+        self._acc = 0.0 # Unsimulated time carried between frames
         while running:
-            dt = self.clock.tick(Config.FPS) / 1000.0
-            mx, my = pygame.mouse.get_pos()
+            dt = min(self.clock.tick(Config.FPS) / 1000.0, Config.MAX_FRAME_DT)
+            now = time.time()
             blink_on = pygame.time.get_ticks() % 600 < 300 
 
             for event in pygame.event.get():
@@ -392,61 +654,49 @@ class V2XApp:
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_x:
                     self.manual_drowsy = not self.manual_drowsy
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    for b in self.buttons: b.check_click((mx, my))
-            for b in self.buttons: b.hover = b.rect.collidepoint((mx, my))
+                    for b in self.buttons: b.check_click(event.pos)
+                if event.type == pygame.MOUSEMOTION:
+                    # Hover only changes when the mouse moves
+                    for b in self.buttons: b.hover = b.rect.collidepoint(event.pos)
 
-            # Update
+            # Update (locked: on_message mutates self.vehicles concurrently)
             is_drowsy = self.detector.drowsy or self.manual_drowsy
-            self.my_vehicle.update_physics(dt, self.vehicles, is_me_drowsy=is_drowsy)
-            
-            self.any_drowsy_detected = is_drowsy
-            for v in self.vehicles.values():
-                if v.drowsy_alert: self.any_drowsy_detected = True
-
-            if self.i_own_ambulance and "AMB-1" in self.vehicles:
-                amb = self.vehicles["AMB-1"]
-                amb.update_physics(dt, self.vehicles)
-                self.client.publish(Config.TOPIC_VEHICLE, amb.to_json())
-
-            for v in self.vehicles.values(): v.update_visuals(dt)
-            self.client.publish(Config.TOPIC_VEHICLE, self.my_vehicle.to_json())
-            self.cleanup_ghosts()
+            with self.vehicles_lock:
+                self._acc += dt
+                while self._acc >= step:
+                    self.step_physics(step, is_drowsy)
+                    self._acc -= step
+                alpha = self._acc / step
+                
+                self.any_drowsy_detected = is_drowsy
+                for v in self.vehicles.values():
+                    if v.drowsy_alert: self.any_drowsy_detected = True
+
+                amb = self.vehicles.get("AMB-1") if self.i_own_ambulance else None
+
+                for v in self.vehicles.values(): v.update_visuals(dt)
+                self.cleanup_ghosts()
+                cars = list(self.vehicles.values()) # Snapshot for drawing
+
+            if amb: self.publish_vehicle(amb, now)
+            self.publish_vehicle(self.my_vehicle, now)
 
             # Draw
-            self.screen.fill(Config.C_BG)
-            road_h = Config.LANE_HEIGHT * Config.LANE_COUNT
-            pygame.draw.rect(self.screen, Config.C_ROAD, (0, Config.ROAD_Y, Config.SCREEN_WIDTH, road_h))
-            
-            for i in range(Config.LANE_COUNT+1):
-                y = Config.ROAD_Y + i*Config.LANE_HEIGHT
-                line_color = Config.C_LINE
-                if i == Config.SERVICE_LANE_INDEX:
-                    line_color = Config.C_LINE_YELLOW 
-                    pygame.draw.line(self.screen, line_color, (0,y), (Config.SCREEN_WIDTH,y), 4)
-                elif i == 0 or i == Config.LANE_COUNT:
-                    pygame.draw.line(self.screen, line_color, (0,y), (Config.SCREEN_WIDTH,y), 3)
-                else:
-                    self.draw_dashed_line(self.screen, line_color, (0, y), (Config.SCREEN_WIDTH, y), 3, 30)
-
-            svc_y = Config.ROAD_Y + (Config.SERVICE_LANE_INDEX * Config.LANE_HEIGHT) + 40
-            svc_txt = self.road_font.render("SERVICE LANE", True, Config.C_SERVICE_TEXT)
-            for x in range(200, Config.SCREEN_WIDTH, 600):
-                self.screen.blit(svc_txt, (x, svc_y))
-
-            for v in self.vehicles.values(): self.draw_car(v)
+            self.screen.blit(self._bg, (0, 0))
+
+            self.draw_cars(cars, alpha, now)
 
             # --- BOTTOM PANEL ---
-            pygame.draw.rect(self.screen, Config.C_PANEL, (0, 640, Config.SCREEN_WIDTH, 160))
             for b in self.buttons: b.draw(self.screen, self.font)
             
             spd_kmh = int(self.my_vehicle.speed * 3.6)
-            self.screen.blit(self.big_font.render(f"Speed: {spd_kmh} km/h", True, Config.C_TEXT), (50, 750))
+            self.screen.blit(self.text(self.big_font, f"Speed: {spd_kmh} km/h", Config.C_TEXT), (50, 750))
 
             # --- ALERTS AREA (Center) ---
             
             # 1. BRAKING ALERT (My Car)
             if self.my_vehicle.braking and blink_on:
-                alert = self.alert_font.render("BRAKING", True, (255, 100, 100))
+                alert = self.text(self.alert_font, "BRAKING", (255, 100, 100))
                 self.screen.blit(alert, (Config.SCREEN_WIDTH//2 - alert.get_width()//2, 650))
 
             # 2. PROXIMITY ALERT (Box in bottom right)
@@ -454,12 +704,12 @@ class V2XApp:
                 box_rect = pygame.Rect(Config.SCREEN_WIDTH - 280, 650, 260, 60)
                 pygame.draw.rect(self.screen, (120, 0, 0), box_rect, border_radius=10)
                 pygame.draw.rect(self.screen, (255, 0, 0), box_rect, 2, border_radius=10)
-                txt = self.font.render("VEHICLE AHEAD!", True, (255, 255, 255))
+                txt = self.text(self.font, "VEHICLE AHEAD!", (255, 255, 255))
                 self.screen.blit(txt, (box_rect.x + 40, box_rect.y + 18))
 
             # 3. GLOBAL DROWSINESS ALERT (Top Center)
             if self.any_drowsy_detected and blink_on:
-                warn_surf = self.alert_font.render("⚠️ DROWSY DRIVER DETECTED ⚠️", True, (255, 255, 255))
+                warn_surf = self.text(self.alert_font, "⚠️ DROWSY DRIVER DETECTED ⚠️", (255, 255, 255))
                 pygame.draw.rect(self.screen, (220, 0, 0), (Config.SCREEN_WIDTH//2 - 420, 5, 840, 50), border_radius=10)
                 self.screen.blit(warn_surf, (Config.SCREEN_WIDTH//2 - warn_surf.get_width()//2, 10))
 
@@ -467,10 +717,10 @@ class V2XApp:
             # Moves to top right so it doesn't overlap buttons
             frame_surf = self.detector.get_frame()
             if frame_surf:
-                frame_surf = pygame.transform.scale(frame_surf, (240, 180))
+                # Already HUD-sized by the grabber
                 self.screen.blit(frame_surf, (Config.SCREEN_WIDTH - 260, 60))
-                pygame.draw.rect(self.screen, (0, 255, 255), (Config.SCREEN_WIDTH - 260, 60, 240, 180), 2)
-                cam_txt = self.font.render("DRIVER CAM", True, (0, 255, 255))
+                pygame.draw.rect(self.screen, (0, 255, 255), (Config.SCREEN_WIDTH - 260, 60, Config.CAM_W, Config.CAM_H), 2)
+                cam_txt = self.text(self.font, "DRIVER CAM", (0, 255, 255))
                 self.screen.blit(cam_txt, (Config.SCREEN_WIDTH - 255, 65))
 
             pygame.display.flip()